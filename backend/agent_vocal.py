@@ -1,19 +1,142 @@
+# backend/agent_vocal.py
+
 import os
+import io
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import threading
+
+import numpy as np
 import openai
 import sounddevice as sd
 import scipy.io.wavfile as wavfile
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def record_audio(duration: int = 5, fs: int = 44100) -> str:
-    wav_path = os.path.join("recordings", "question.wav")
-    recording = sd.rec(int(duration * fs), samplerate=fs, channels=1)
-    sd.wait()
-    wavfile.write(wav_path, fs, recording)
-    return wav_path
+# ——————————————————————————————
+# Configuration générale
+# ——————————————————————————————
+_FS               = 16000             # Whisper travaille en 16 kHz, inutile d'en capter plus
+_FRAME_MS         = 30                # taille d'une trame analysée par le VAD
+_SILENCE_MS       = 600               # silence nécessaire pour considérer la fin de parole
+_MIN_SPEECH_MS    = 250               # en dessous : bruit, on ignore
+_MAX_UTTERANCE_S  = 30                # garde-fou si personne ne se tait
+_CALIBRATION_MS   = 300               # mesure du bruit ambiant avant écoute
+_VAD_RATIO        = 3.0               # seuil de parole = bruit ambiant × ratio
+_VAD_FLOOR        = 0.01              # seuil RMS minimal (signal float32 normalisé)
+_SENTENCE_END     = re.compile(r"(?<=[.!?…])\s+")
+_MIN_SENTENCE     = 20                # plus court : on attend la suite (prosodie plus fluide)
+_LATENCY_LOG      = os.path.join("recordings", "agent_latency.jsonl")
+
+
+# ——————————————————————————————
+# Capture micro avec détection de fin de parole (VAD)
+# ——————————————————————————————
+def _rms(frame: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(np.square(frame), dtype=np.float64)))
+
+def listen_utterance(fs: int = _FS,
+                     silence_ms: int = _SILENCE_MS,
+                     max_seconds: int = _MAX_UTTERANCE_S):
+    """
+    Écoute le micro jusqu'à ce que l'utilisateur se taise (VAD par énergie).
+    Retourne (audio float32 mono, instant monotonic de fin de parole),
+    ou (None, None) si aucune parole n'a été détectée.
+    """
+    frame_len    = int(fs * _FRAME_MS / 1000)
+    silence_max  = max(1, silence_ms // _FRAME_MS)
+    speech_min   = max(1, _MIN_SPEECH_MS // _FRAME_MS)
+    calib_frames = max(1, _CALIBRATION_MS // _FRAME_MS)
+    max_frames   = int(max_seconds * 1000 / _FRAME_MS)
+
+    frames = queue.Queue()
+
+    def callback(indata, n, _, status):
+        if status:
+            print(f"[agent_vocal] {status}", file=sys.stderr)
+        frames.put(indata[:, 0].copy())
+
+    voiced      = []
+    noise       = []
+    speech_run  = 0
+    silence_run = 0
+    started     = False
+    end_of_speech = None
 
-def recognize_audio(wav_file: str) -> str:
-    with open(wav_file, "rb") as f:
+    with sd.InputStream(samplerate=fs, channels=1, dtype="float32",
+                        blocksize=frame_len, callback=callback):
+        for _ in range(calib_frames + max_frames):
+            frame = frames.get()
+            level = _rms(frame)
+            if len(noise) < calib_frames:
+                noise.append(level)
+                continue
+            threshold = max(_VAD_FLOOR, float(np.median(noise)) * _VAD_RATIO)
+
+            if level >= threshold:
+                speech_run += 1
+                silence_run = 0
+                if not started and speech_run >= 2:
+                    started = True
+            else:
+                speech_run = 0
+                silence_run += 1
+
+            if started or speech_run:
+                voiced.append(frame)
+            elif voiced:
+                voiced = []               # pic isolé : ce n'était pas de la parole
+            if started and silence_run >= silence_max:
+                end_of_speech = time.monotonic() - silence_run * _FRAME_MS / 1000
+                break
+
+    if not started or len(voiced) - silence_run < speech_min:
+        return None, None
+    if end_of_speech is None:
+        end_of_speech = time.monotonic()
+    # on coupe le silence de queue, inutile à envoyer à Whisper
+    keep = voiced[:len(voiced) - silence_run] if silence_run else voiced
+    return np.concatenate(keep), end_of_speech
+
+def _to_float(audio: np.ndarray) -> np.ndarray:
+    """
+    Ramène un signal WAV (PCM entier ou flottant) en float32 dans [-1, 1].
+    Le PCM 8 bits est non signé, centré sur 128.
+    """
+    if audio.dtype == np.uint8:
+        return (audio.astype(np.float32) - 128.0) / 128.0
+    if np.issubdtype(audio.dtype, np.integer):
+        return audio.astype(np.float32) / float(-np.iinfo(audio.dtype).min)
+    return audio.astype(np.float32)
+
+def _to_wav_bytes(audio: np.ndarray, fs: int = _FS) -> bytes:
+    """
+    Encode un signal float32 en WAV PCM 16 bits, entièrement en mémoire.
+    """
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    buf = io.BytesIO()
+    wavfile.write(buf, fs, pcm)
+    return buf.getvalue()
+
+
+# ——————————————————————————————
+# Whisper & chat
+# ——————————————————————————————
+def recognize_audio(wav) -> str:
+    """
+    Transcrit un WAV (chemin ou octets en mémoire) via Whisper.
+    """
+    if isinstance(wav, (bytes, bytearray)):
+        resp = openai.audio.transcriptions.create(
+            file=("question.wav", bytes(wav)),
+            model="whisper-1"
+        )
+        return resp.text
+    with open(wav, "rb") as f:
         resp = openai.audio.transcriptions.create(
             file=f,
             model="whisper-1"
@@ -33,11 +156,284 @@ def ask_openai(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 150) -
     # la réponse texte est toujours dans choices[0].message.content
     return resp.choices[0].message.content
 
+def _is_sentence(text: str) -> bool:
+    """
+    Vrai si `text` peut être lu seul : assez long, et pas coupé après une
+    abréviation (« M. », « Mme. », « Dr. »…).
+    """
+    if len(text) < _MIN_SENTENCE:
+        return False
+    if text.endswith("."):
+        last = text.rsplit(None, 1)[-1]
+        if len(last) <= 4 and last[:1].isupper():
+            return False
+    return True
+
+def _pop_sentences(pending: str):
+    """
+    Découpe le texte reçu jusqu'ici en phrases complètes.
+    Retourne (phrases, reste encore incomplet).
+    """
+    sentences = []
+    start = 0
+    for m in _SENTENCE_END.finditer(pending):
+        candidate = pending[start:m.start()].strip()
+        if _is_sentence(candidate):
+            sentences.append(candidate)
+            start = m.end()
+    return sentences, pending[start:]
+
+def stream_sentences(messages: list, model: str = "gpt-4o-mini", max_tokens: int = 150):
+    """
+    Appelle le chat en streaming et produit la réponse phrase par phrase,
+    dès qu'une ponctuation de fin est reçue.
+    """
+    stream = openai.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    pending = ""
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        pending += chunk.choices[0].delta.content or ""
+        sentences, pending = _pop_sentences(pending)
+        yield from sentences
+    if pending.strip():
+        yield pending.strip()
+
+
+# ——————————————————————————————
+# Synthèse vocale : moteur unique, piloté par un thread dédié
+# ——————————————————————————————
+class _Speaker:
+    """
+    pyttsx3 n'est pas thread-safe et son init() coûte cher : on garde un seul
+    moteur, alimenté par une file de phrases.
+    """
+
+    def __init__(self):
+        self._queue  = queue.Queue()
+        self._thread = None
+        self._lock   = threading.Lock()
+        self._ready  = threading.Event()
+        self.available = True
+
+    def _run(self):
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+        except (ImportError, RuntimeError, OSError) as e:
+            print(f"[agent_vocal] TTS non dispo, skip. ({e})", file=sys.stderr)
+            self.available = False
+            engine = None
+        self._ready.set()
+
+        # `on_start` est déclenché par pyttsx3 quand la lecture commence
+        # réellement, synthèse comprise
+        current = {}
+        if engine is not None:
+            engine.connect("started-utterance",
+                           lambda name: current.pop(name, lambda: None)())
+
+        n = 0
+        while True:
+            text, on_start, done = self._queue.get()
+            try:
+                if engine is not None:
+                    n += 1
+                    name = f"utt-{n}"
+                    if on_start:
+                        current[name] = on_start
+                    engine.say(text, name)
+                    engine.runAndWait()
+                    current.pop(name, None)
+            finally:
+                if done:
+                    done.set()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def warm_up(self) -> None:
+        """
+        Démarre le moteur et attend son initialisation, pour qu'elle ne soit
+        pas comptée dans la latence du premier tour.
+        """
+        self._ensure_started()
+        self._ready.wait()
+
+    def say(self, text: str, on_start=None) -> threading.Event:
+        """
+        Met une phrase en file ; `on_start` est appelé quand sa lecture démarre
+        (jamais si le TTS est indisponible).
+        """
+        self._ensure_started()
+        done = threading.Event()
+        self._queue.put((text, on_start, done))
+        return done
+
+_speaker = _Speaker()
+
 def speak(text: str) -> None:
+    _speaker.say(text).wait()
+
+
+# ——————————————————————————————
+# Session vocale (état isolé par utilisateur)
+# ——————————————————————————————
+class VoiceSession:
+    """
+    Boucle écoute → Whisper → chat streamé → TTS pour un utilisateur.
+    Chaque session garde son propre historique et ses mesures de latence ;
+    l'audio ne transite que par la mémoire.
+    """
+
+    def __init__(self, session_id: str = None,
+                 system_prompt: str = "Tu es un assistant vocal concis. Réponds en phrases courtes.",
+                 model: str = "gpt-4o-mini",
+                 max_tokens: int = 150,
+                 latency_log: str = _LATENCY_LOG):
+        self.session_id  = session_id or str(uuid.uuid4())
+        self.model       = model
+        self.max_tokens  = max_tokens
+        self.latency_log = latency_log
+        self.messages    = [{"role": "system", "content": system_prompt}]
+        self.latencies   = []
+        _speaker.warm_up()
+
+    def respond(self, audio: np.ndarray, end_of_speech: float, fs: int = _FS) -> str:
+        """
+        Traite un tour de parole déjà capté et lit la réponse au fil de l'eau.
+        """
+        t_stt = time.monotonic()
+        question = recognize_audio(_to_wav_bytes(audio, fs))
+        t_stt_done = time.monotonic()
+        if not question.strip():
+            return ""
+        user_msg = {"role": "user", "content": question}
+
+        first_audio = []
+        def mark_first_audio():
+            if not first_audio:
+                first_audio.append(time.monotonic())
+
+        sentences = []
+        last_done = None
+        for sentence in stream_sentences(self.messages + [user_msg], self.model, self.max_tokens):
+            if not sentences:
+                t_first_sentence = time.monotonic()
+            sentences.append(sentence)
+            last_done = _speaker.say(sentence, on_start=mark_first_audio)
+        if last_done is not None:
+            last_done.wait()
+
+        answer = " ".join(sentences)
+        # l'historique n'est complété qu'une fois le tour abouti
+        self.messages += [user_msg, {"role": "assistant", "content": answer}]
+        # sans TTS, aucun son n'a été produit : pas de mesure
+        if first_audio and _speaker.available:
+            self._record_latency({
+                "stt_ms":            round((t_stt_done - t_stt) * 1000),
+                "first_sentence_ms": round((t_first_sentence - end_of_speech) * 1000),
+                "first_audio_ms":    round((first_audio[0] - end_of_speech) * 1000),
+            })
+        return answer
+
+    def turn(self) -> str:
+        """
+        Un tour complet : écoute jusqu'au silence puis répond.
+        """
+        audio, end_of_speech = listen_utterance()
+        if audio is None:
+            return ""
+        return self.respond(audio, end_of_speech)
+
+    def _record_latency(self, sample: dict) -> None:
+        sample = {"session": self.session_id, "ts": time.time(), **sample}
+        self.latencies.append(sample)
+        print(f"[agent_vocal] fin de parole → 1er son : {sample['first_audio_ms']} ms",
+              file=sys.stderr)
+        if self.latency_log:
+            os.makedirs(os.path.dirname(self.latency_log) or ".", exist_ok=True)
+            with open(self.latency_log, "a") as f:
+                f.write(json.dumps(sample) + "\n")
+
+
+# ——————————————————————————————
+# Benchmark latence fin de parole → premier son
+# ——————————————————————————————
+def _summarize(samples: list) -> dict:
+    """
+    Agrège des mesures de latence (p50 / p95 / max, en ms).
+    """
+    if not samples:
+        return {"count": 0}
+    report = {"count": len(samples)}
+    for key in ("stt_ms", "first_sentence_ms", "first_audio_ms"):
+        values = np.array([s[key] for s in samples if key in s], dtype=np.float64)
+        if values.size:
+            report[key] = {
+                "p50": round(float(np.percentile(values, 50))),
+                "p95": round(float(np.percentile(values, 95))),
+                "max": round(float(values.max())),
+            }
+    return report
+
+def latency_report(path: str = _LATENCY_LOG) -> dict:
+    """
+    Agrège les mesures enregistrées lors des sessions micro.
+    """
+    if not os.path.exists(path):
+        return {"count": 0}
+    with open(path) as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    return _summarize(samples)
+
+def run_benchmark(wav_path: str, runs: int = 10) -> dict:
+    """
+    Rejoue un WAV fixe dans `respond()` `runs` fois (session neuve à chaque
+    fois) : mesure reproductible, comparable d'une version à l'autre.
+    """
+    fs, audio = wavfile.read(wav_path)
+    audio = _to_float(audio)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+
+    _speaker.warm_up()
+    samples = []
+    for _ in range(runs):
+        session = VoiceSession(latency_log=None)
+        session.respond(audio, time.monotonic(), fs=fs)
+        samples.extend(session.latencies)
+    report = _summarize(samples)
+    report["runs"] = runs
+    return report
+
+
+if __name__ == "__main__":
+    if "--report" in sys.argv:
+        print(json.dumps(latency_report(), indent=2))
+        sys.exit(0)
+    if "--bench" in sys.argv:
+        args = sys.argv[sys.argv.index("--bench") + 1:]
+        if not args:
+            sys.exit("usage : python agent_vocal.py --bench <fichier.wav> [runs]")
+        runs = int(args[1]) if len(args) > 1 else 10
+        print(json.dumps(run_benchmark(args[0], runs), indent=2))
+        sys.exit(0)
+    session = VoiceSession()
+    print(f"[agent_vocal] session {session.session_id} — parlez (Ctrl+C pour quitter)",
+          file=sys.stderr)
     try:
-        import pyttsx3
-        engine = pyttsx3.init()
-        engine.say(text)
-        engine.runAndWait()
-    except ImportError:
-        print("[agent_vocal] TTS non dispo, skip.")
+        while True:
+            answer = session.turn()
+            if answer:
+                print(answer)
+    except KeyboardInterrupt:
+        print(json.dumps(latency_report(), indent=2))
@@ -22,6 +22,7 @@ from meeting_transcription import (
     stop_recording,
     transcribe_with_progress,
 )
+from speaker_index import speaker_index
 
 # —————————————————————————————————————————
 # App & CORS
@@ -73,6 +74,8 @@ app.add_middleware(
 # Structure: { id: { wav: str, docx: str | None, date: datetime, duration: str | None } }
 RECORDINGS = {}
 
+_UPLOAD_CHUNK = 1024 * 1024
+
 # —————————————————————————————————————————
 # 1) Démarrage / arrêt de l’enregistrement live
 # —————————————————————————————————————————
@@ -111,9 +114,10 @@ async def api_upload(file: UploadFile = File(...)):
     rec_id = str(uuid.uuid4())
     wav_path = os.path.join("recordings", f"{rec_id}.wav")
     os.makedirs("recordings", exist_ok=True)
-    content = await file.read()
+    # copie par blocs : on ne charge jamais le fichier entier en mémoire
     with open(wav_path, "wb") as f:
-        f.write(content)
+        while chunk := await file.read(_UPLOAD_CHUNK):
+            f.write(chunk)
     RECORDINGS[rec_id] = {
         "wav": wav_path,
         "docx": None,
@@ -192,7 +196,25 @@ def download_report(id: str):
 
 
 # —————————————————————————————————————————
-# 6) Alias routes sans "/api" pour compatibilité
+# 6) Profils de locuteurs (identification entre réunions)
+# —————————————————————————————————————————
+
+@app.get("/api/speakers", dependencies=[Depends(verify_token)])
+def api_speakers():
+    return JSONResponse(speaker_index.profiles())
+
+
+@app.post("/api/speakers/{speaker_id}/name", dependencies=[Depends(verify_token)])
+def api_name_speaker(speaker_id: str, name: str = Body(..., embed=True)):
+    try:
+        speaker_index.rename(speaker_id, name)
+    except KeyError:
+        raise HTTPException(404, "Locuteur inconnu")
+    return {"id": speaker_id, "name": name.strip()}
+
+
+# —————————————————————————————————————————
+# 7) Alias routes sans "/api" pour compatibilité
 # —————————————————————————————————————————
 
 @app.post("/start-recording", include_in_schema=False)
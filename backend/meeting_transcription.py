@@ -5,6 +5,7 @@ load_dotenv()  # charge OPENAI_API_KEY et HUGGINGFACE_TOKEN depuis .env
 
 import os
 import sys
+import inspect
 import tempfile
 import queue
 import numpy as np
@@ -15,6 +16,8 @@ from pydub import AudioSegment
 from docx import Document
 from pyannote.audio import Pipeline
 
+from speaker_index import speaker_index, load_diarization, save_diarization
+
 # ——————————————————————————————
 # Configuration générale
 # ——————————————————————————————
@@ -22,7 +25,7 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 HF_TOKEN       = os.getenv("HUGGINGFACE_HUB_TOKEN") or os.getenv("HUGGINGFACE_TOKEN")
 _MAX_BYTES     = 25 * 1024 * 1024      # 25 MiB max for Whisper upload
 _CHUNK_MS       = 4 * 60 * 1000        # 4 minutes per chunk
-_DIAR_THRESHOLD = 1        # 5 minutes max for diarization
+_DIAR_THRESHOLD = int(os.getenv("DIAR_THRESHOLD_MS", 5 * 60 * 1000))  # 5 minutes max for diarization
 
 # ——————————————————————————————
 # Chargement du pipeline Pyannote pour diarization
@@ -37,6 +40,12 @@ except Exception as e:
     print(f"[diarization] ⚠️ Échec du chargement du pipeline : {e}", file=sys.stderr)
     pipeline = None
 
+# Pyannote ≥ 3 sait renvoyer un embedding par locuteur ; on le vérifie une fois
+_DIAR_EMBEDDINGS = (
+    pipeline is not None
+    and "return_embeddings" in inspect.signature(pipeline.apply).parameters
+)
+
 # ——————————————————————————————
 # Variables & helpers pour enregistrement live
 # ——————————————————————————————
@@ -131,15 +140,38 @@ def _transcribe_simple(audio_input) -> str:
         texts.append(_encode_and_transcribe(chunk))
     return "\n".join(texts)
 
+# ——————————————————————————————
+# Diarization + embeddings des locuteurs
+# ——————————————————————————————
+def _diarize(wav_path: str):
+    """
+    Lance Pyannote et retourne (turns, labels, embeddings) :
+      - turns : [(start_ms, end_ms, label)] dans l’ordre chronologique
+      - labels : labels distincts, alignés sur les lignes de `embeddings`
+    Les embeddings sont vides si la version de Pyannote ne les expose pas.
+    """
+    if _DIAR_EMBEDDINGS:
+        diar, embeddings = pipeline(wav_path, return_embeddings=True)
+    else:
+        diar, embeddings = pipeline(wav_path), None
+    turns = [
+        (int(turn.start * 1000), int(turn.end * 1000), label)
+        for turn, _, label in diar.itertracks(yield_label=True)
+    ]
+    labels = list(diar.labels())
+    if embeddings is None or len(embeddings) != len(labels):
+        return turns, [], np.zeros((0, 0), dtype=np.float32)
+    return turns, labels, np.asarray(embeddings, dtype=np.float32)
+
 # ——————————————————————————————
 # Générateur de progression + diarization limitée
 # ——————————————————————————————
 def transcribe_with_progress(audio_file: str):
     """
     Générateur d’événements SSE :
-      - phase=diarization status=start|skipped|end count
-      - phase=transcription total/done
-      - phase=summary status=start|end
+      - phase=diarization status=start|skipped|end count cached speakers
+      - phase=transcription total/done index speaker text, puis status=end transcript
+      - phase=summary status=start|end, delta (texte streamé)
       - phase=docx status=start|end path
       - return (transcript, summary, docx_path)
     """
@@ -147,21 +179,33 @@ def transcribe_with_progress(audio_file: str):
     tmp_wav = tempfile.NamedTemporaryFile(suffix=".wav", delete=False).name
     AudioSegment.from_file(audio_file).export(tmp_wav, format="wav")
 
-    # 2) diarization si <5min et pipeline dispo
+    # 2) diarization si <5min et pipeline dispo (ou résultat déjà en cache)
     yield {"phase":"diarization","status":"start"}
     audio_seg = AudioSegment.from_file(tmp_wav)
     duration_ms = len(audio_seg)
 
-    if pipeline is None or duration_ms > _DIAR_THRESHOLD:
+    cached = load_diarization(audio_file) if duration_ms <= _DIAR_THRESHOLD else None
+    if cached is None and (pipeline is None or duration_ms > _DIAR_THRESHOLD):
         yield {"phase":"diarization","status":"skipped","count":1}
+        turns = None
+        names = {}
         segments = [(0, None)]
     else:
-        diar = pipeline(tmp_wav)
-        segments = [
-            (int(turn.start * 1000), int(turn.end * 1000))
-            for turn, _, _ in diar.itertracks(yield_label=True)
-        ]
-        yield {"phase":"diarization","status":"end","count":len(segments)}
+        if cached is not None:
+            turns, labels, embeddings, assigned = cached
+        else:
+            turns, labels, embeddings = _diarize(tmp_wav)
+            assigned = {}
+        previous = assigned
+        if len(labels):
+            assigned = speaker_index.identify(labels, embeddings, assigned)
+        # le cache n'est réécrit que s'il manque ou si l'association a changé
+        if cached is None or assigned != previous:
+            save_diarization(audio_file, turns, labels, embeddings, assigned)
+        names = speaker_index.display_names(assigned)
+        segments = [(start_ms, end_ms) for start_ms, end_ms, _ in turns]
+        yield {"phase":"diarization","status":"end","count":len(segments),
+               "cached":cached is not None,"speakers":names}
 
     # 3) transcription en parallèle
     yield {"phase":"transcription","total":len(segments),"done":0}
@@ -177,19 +221,24 @@ def transcribe_with_progress(audio_file: str):
             idx = futures[fut]
             texts[idx] = fut.result()
             done += 1
-            yield {"phase":"transcription","done":done}
+            speaker = names.get(turns[idx][2], turns[idx][2]) if turns else None
+            yield {"phase":"transcription","done":done,
+                   "index":idx,"speaker":speaker,"text":texts[idx]}
 
     # 4) reconstruction du transcript avec/sans locuteurs
-    if pipeline and duration_ms <= _DIAR_THRESHOLD:
-        # on reprend l’ordre des locuteurs
-        speakers = [label for _,_,label in diar.itertracks(yield_label=True)]
-        transcript = "\n".join(f"[{speakers[i]}] {texts[i]}" for i in range(len(texts)))
+    if turns is not None:
+        # on reprend l’ordre des locuteurs, nommés quand ils sont connus
+        transcript = "\n".join(
+            f"[{names.get(label, label)}] {texts[i]}"
+            for i, (_, _, label) in enumerate(turns)
+        )
     else:
         transcript = texts[0]
+    yield {"phase":"transcription","status":"end","transcript":transcript}
 
-    # 5) résumé
+    # 5) résumé (streamé au client au fil de la génération)
     yield {"phase":"summary","status":"start"}
-    summary_resp = openai.chat.completions.create(
+    summary_stream = openai.chat.completions.create(
         model="gpt-4o",
         messages=[
             {"role":"system","content":(
@@ -215,8 +264,15 @@ def transcribe_with_progress(audio_file: str):
             )}
         ],
         max_tokens=1500,
+        stream=True,
     )
-    summary = summary_resp.choices[0].message.content
+    parts = []
+    for chunk in summary_stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            yield {"phase":"summary","delta":delta}
+    summary = "".join(parts)
     yield {"phase":"summary","status":"end"}
 
     # 6) génération du .docx
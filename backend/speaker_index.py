@@ -0,0 +1,286 @@
+# backend/speaker_index.py
+
+import os
+import sys
+import uuid
+import threading
+import numpy as np
+
+# ——————————————————————————————
+# Configuration générale
+# ——————————————————————————————
+_INDEX_PATH      = os.getenv("SPEAKER_INDEX_PATH", os.path.join("recordings", "speaker_index.npz"))
+_MATCH_THRESHOLD = float(os.getenv("SPEAKER_MATCH_THRESHOLD", "0.6"))  # similarité cosinus minimale
+_IVF_MIN         = 256      # en dessous, un balayage complet est plus rapide que l'index
+_NPROBE          = 4        # nombre de listes inspectées par requête
+_KMEANS_ITERS    = 10
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# ——————————————————————————————
+# Index vectoriel des locuteurs connus
+# ——————————————————————————————
+class SpeakerIndex:
+    """
+    Profils de locuteurs persistés entre réunions : un embedding normalisé
+    (stocké en float16) par profil, un nom éventuel et le nombre
+    d'occurrences fusionnées.
+
+    La recherche se fait par similarité cosinus. Au-delà de `_IVF_MIN`
+    profils, un partitionnement k-means (√N listes) limite chaque requête
+    à `_NPROBE` listes au lieu de tout l'index.
+    """
+
+    def __init__(self, path: str = _INDEX_PATH):
+        self.path     = path
+        self._lock    = threading.RLock()
+        self.ids      = []
+        self.names    = []
+        self.counts   = np.zeros(0, dtype=np.int32)
+        self.vectors  = np.zeros((0, 0), dtype=np.float16)
+        self._centroids = None
+        self._lists     = None
+        self._bucket    = None      # indice de profil → liste IVF
+        self._built_for = 0
+        self.load()
+
+    # —— persistance ——
+    def load(self) -> None:
+        with self._lock:
+            if not os.path.exists(self.path):
+                return
+            try:
+                with np.load(self.path, allow_pickle=False) as data:
+                    self.ids     = [str(x) for x in data["ids"]]
+                    self.names   = [str(x) for x in data["names"]]
+                    self.counts  = data["counts"].astype(np.int32)
+                    self.vectors = data["vectors"].astype(np.float16)
+            except Exception as e:
+                print(f"[speakers] ⚠️ Index illisible ({e}), on repart de zéro.", file=sys.stderr)
+                return
+            self._rebuild()
+
+    def save(self) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp.npz"
+            np.savez(
+                tmp,
+                ids=np.array(self.ids, dtype=str),
+                names=np.array(self.names, dtype=str),
+                counts=self.counts,
+                vectors=self.vectors,
+            )
+            os.replace(tmp, self.path)
+
+    # —— partitionnement IVF ——
+    def _rebuild(self) -> None:
+        n = len(self.ids)
+        self._built_for = n
+        if n < _IVF_MIN:
+            self._centroids = None
+            self._lists     = None
+            self._bucket    = None
+            return
+        data  = self.vectors.astype(np.float32)
+        nlist = int(np.sqrt(n))
+        rng   = np.random.default_rng(0)
+        centroids = data[rng.choice(n, nlist, replace=False)]
+        for _ in range(_KMEANS_ITERS):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        assign = np.argmax(data @ centroids.T, axis=1)
+        self._centroids = centroids
+        self._lists     = [list(np.flatnonzero(assign == c)) for c in range(nlist)]
+        self._bucket    = [int(c) for c in assign]
+
+    def _reassign(self, idx: int) -> None:
+        """
+        Replace un profil dont le vecteur a changé dans la liste IVF la plus proche.
+        """
+        if self._centroids is None:
+            return
+        new = int(np.argmax(self._centroids @ self.vectors[idx].astype(np.float32)))
+        old = self._bucket[idx]
+        if new != old:
+            self._lists[old].remove(idx)
+            self._lists[new].append(idx)
+            self._bucket[idx] = new
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.arange(len(self.ids))
+        probe = np.argsort(-(self._centroids @ query))[:_NPROBE]
+        return np.fromiter((i for c in probe for i in self._lists[c]), dtype=np.int64)
+
+    def _append(self, embedding: np.ndarray, name: str = "") -> int:
+        vec = embedding.astype(np.float16)[None, :]
+        self.vectors = vec if not len(self.ids) else np.vstack([self.vectors, vec])
+        self.ids.append(uuid.uuid4().hex[:12])
+        self.names.append(name)
+        self.counts = np.append(self.counts, np.int32(1))
+        idx = len(self.ids) - 1
+        # reconstruction amortie : seulement quand l'index a doublé
+        n = len(self.ids)
+        if n >= _IVF_MIN and (self._centroids is None or n >= 2 * self._built_for):
+            self._rebuild()
+        elif self._centroids is not None:
+            c = int(np.argmax(self._centroids @ embedding))
+            self._lists[c].append(idx)
+            self._bucket.append(c)
+        return idx
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1] if len(self.ids) else None
+
+    # —— recherche & mise à jour ——
+    def search(self, embedding) -> tuple:
+        """
+        Retourne (indice du profil le plus proche, similarité), ou (None, -1.0).
+        """
+        query = _normalize(embedding)
+        with self._lock:
+            if not len(self.ids) or query.shape[-1] != self.dim:
+                return None, -1.0
+            cand = self._candidates(query)
+            if not len(cand):
+                return None, -1.0
+            sims = self.vectors[cand].astype(np.float32) @ query
+            best = int(np.argmax(sims))
+            return int(cand[best]), float(sims[best])
+
+    def identify(self, labels: list, embeddings, assigned: dict = None) -> dict:
+        """
+        Associe chaque label de diarization (SPEAKER_00…) à un profil.
+
+        `assigned` ({label: profile_id}) provient du cache d'un enregistrement
+        déjà traité : ces associations sont reprises telles quelles, sans
+        recompter les occurrences. Les nouveaux locuteurs sans correspondance
+        au-dessus du seuil deviennent des profils anonymes, nommables ensuite.
+        Retourne {label: profile_id}.
+        """
+        assigned = dict(assigned or {})
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            known = {pid: i for i, pid in enumerate(self.ids)}
+            result = {l: pid for l, pid in assigned.items() if pid in known}
+            taken = set(result.values())
+
+            proposals = []
+            for label, emb in zip(labels, embeddings):
+                if label in result or not np.all(np.isfinite(emb)):
+                    continue
+                if np.linalg.norm(emb) < 1e-6:
+                    # ligne de remplissage (pyannote complète par des zéros)
+                    continue
+                if self.dim is not None and emb.shape[-1] != self.dim:
+                    # autre modèle d'embedding : incomparable avec l'index
+                    print(f"[speakers] ⚠️ Embedding de dimension {emb.shape[-1]} "
+                          f"(index : {self.dim}), {label} ignoré.", file=sys.stderr)
+                    continue
+                idx, sim = self.search(emb)
+                proposals.append((sim, label, idx, _normalize(emb)))
+
+            # les meilleures correspondances d'abord ; un profil par label
+            changed = False
+            for sim, label, idx, emb in sorted(proposals, key=lambda p: -p[0]):
+                if idx is not None and sim >= _MATCH_THRESHOLD and self.ids[idx] not in taken:
+                    c = int(self.counts[idx])
+                    merged = self.vectors[idx].astype(np.float32) * c + emb
+                    self.vectors[idx] = _normalize(merged).astype(np.float16)
+                    self.counts[idx] = c + 1
+                    self._reassign(idx)
+                else:
+                    idx = self._append(emb)
+                result[label] = self.ids[idx]
+                taken.add(self.ids[idx])
+                changed = True
+
+            if changed:
+                self.save()
+            return result
+
+    def display_names(self, mapping: dict) -> dict:
+        """
+        {label: profile_id} → {label: nom affiché} (label d'origine si anonyme).
+        """
+        with self._lock:
+            known = dict(zip(self.ids, self.names))
+        return {label: known.get(pid) or label for label, pid in mapping.items()}
+
+    def rename(self, profile_id: str, name: str) -> None:
+        with self._lock:
+            if profile_id not in self.ids:
+                raise KeyError(profile_id)
+            self.names[self.ids.index(profile_id)] = name.strip()
+            self.save()
+
+    def profiles(self) -> list:
+        with self._lock:
+            return [
+                {"id": pid, "name": name, "count": int(count)}
+                for pid, name, count in zip(self.ids, self.names, self.counts)
+            ]
+
+
+# ——————————————————————————————
+# Cache des résultats de diarization par enregistrement
+# ——————————————————————————————
+def _cache_path(audio_file: str) -> str:
+    return f"{audio_file}.diar.npz"
+
+def load_diarization(audio_file: str):
+    """
+    Relit la diarization mise en cache pour `audio_file` si elle est à jour.
+    Retourne (turns, labels, embeddings, assigned) ou None.
+    """
+    path = _cache_path(audio_file)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(audio_file):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            turns = [
+                (int(s), int(e), str(l))
+                for s, e, l in zip(data["starts"], data["ends"], data["turn_labels"])
+            ]
+            labels     = [str(l) for l in data["labels"]]
+            embeddings = data["embeddings"].astype(np.float32)
+            assigned   = {
+                str(l): str(p) for l, p in zip(data["assigned_labels"], data["assigned_ids"])
+            }
+    except Exception as e:
+        print(f"[speakers] ⚠️ Cache diarization illisible ({e}).", file=sys.stderr)
+        return None
+    return turns, labels, embeddings, assigned
+
+def save_diarization(audio_file: str, turns: list, labels: list,
+                     embeddings, assigned: dict) -> None:
+    """
+    Met la diarization en cache. Best effort : un échec n'interrompt pas le rapport.
+    """
+    try:
+        np.savez(
+            _cache_path(audio_file),
+            starts=np.array([t[0] for t in turns], dtype=np.int64),
+            ends=np.array([t[1] for t in turns], dtype=np.int64),
+            turn_labels=np.array([t[2] for t in turns], dtype=str),
+            labels=np.array(labels, dtype=str),
+            embeddings=np.asarray(embeddings, dtype=np.float16),
+            assigned_labels=np.array(list(assigned.keys()), dtype=str),
+            assigned_ids=np.array(list(assigned.values()), dtype=str),
+        )
+    except OSError as e:
+        print(f"[speakers] ⚠️ Cache diarization non écrit ({e}).", file=sys.stderr)
+
+
+speaker_index = SpeakerIndex()
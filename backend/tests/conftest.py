@@ -0,0 +1,5 @@
+import os
+import sys
+
+# les modules du backend s'importent à plat (cf. main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
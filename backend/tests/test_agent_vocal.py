@@ -0,0 +1,129 @@
+import io
+import sys
+import types
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import scipy.io.wavfile as wavfile
+
+# PortAudio n'est pas forcément présent : le micro est simulé dans ces tests
+try:
+    import sounddevice  # noqa: F401
+except (ImportError, OSError):
+    sys.modules["sounddevice"] = types.ModuleType("sounddevice")
+
+import agent_vocal as av
+
+
+def _fake_openai(deltas=None, transcript="Bonjour", error=None):
+    def create(**kwargs):
+        if error:
+            raise error
+        return [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=d))])
+            for d in deltas
+        ]
+    return SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create)),
+        audio=SimpleNamespace(transcriptions=SimpleNamespace(
+            create=lambda **kwargs: SimpleNamespace(text=transcript))),
+    )
+
+
+# ——————————————————————————————
+# Découpage en phrases
+# ——————————————————————————————
+def test_stream_sentences_splits_on_sentence_ends(monkeypatch):
+    deltas = ["Bonjour M. Dupont, ravi de vous", " revoir aujourd'hui. Le chantier",
+              " avance : la dalle est coulée ; reste les murs ! Des questions ?"]
+    monkeypatch.setattr(av, "openai", _fake_openai(deltas))
+    assert list(av.stream_sentences([])) == [
+        "Bonjour M. Dupont, ravi de vous revoir aujourd'hui.",
+        "Le chantier avance : la dalle est coulée ; reste les murs !",
+        "Des questions ?",
+    ]
+
+def test_short_fragments_wait_for_more_text():
+    sentences, rest = av._pop_sentences("Oui. Bien sûr, on peut le faire. Ensuite")
+    assert sentences == ["Oui. Bien sûr, on peut le faire."]
+    assert rest == "Ensuite"
+
+
+# ——————————————————————————————
+# Audio en mémoire
+# ——————————————————————————————
+def test_wav_bytes_round_trip():
+    t = np.arange(1600) / av._FS
+    audio = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    fs, pcm = wavfile.read(io.BytesIO(av._to_wav_bytes(audio)))
+    assert fs == av._FS
+    assert pcm.dtype == np.int16
+    np.testing.assert_allclose(av._to_float(pcm), audio, atol=1e-4)
+
+def test_to_float_handles_unsigned_8bit():
+    pcm = np.array([0, 128, 255], dtype=np.uint8)
+    np.testing.assert_allclose(av._to_float(pcm), [-1.0, 0.0, 127 / 128])
+
+
+# ——————————————————————————————
+# Détection de fin de parole
+# ——————————————————————————————
+class _FakeInputStream:
+    frames = []
+
+    def __init__(self, samplerate, channels, dtype, blocksize, callback):
+        self.callback = callback
+
+    def __enter__(self):
+        for frame in self.frames:
+            self.callback(frame[:, None], len(frame), None, None)
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def _frames(levels, fs=av._FS):
+    n = int(fs * av._FRAME_MS / 1000)
+    return [np.full(n, level, dtype=np.float32) for level in levels]
+
+def _listen(monkeypatch, levels):
+    stream = type("Stream", (_FakeInputStream,), {"frames": _frames(levels)})
+    monkeypatch.setattr(av, "sd", SimpleNamespace(InputStream=stream), raising=False)
+    return av.listen_utterance(max_seconds=2)
+
+def test_listen_utterance_stops_after_silence(monkeypatch):
+    calib   = av._CALIBRATION_MS // av._FRAME_MS
+    speech  = 20
+    silence = av._SILENCE_MS // av._FRAME_MS
+    audio, end = _listen(monkeypatch, [0.001] * calib + [0.2] * speech + [0.001] * (silence + 50))
+    assert end is not None
+    # le silence de queue est retiré
+    assert len(audio) == speech * int(av._FS * av._FRAME_MS / 1000)
+    assert np.all(audio == np.float32(0.2))
+
+def test_listen_utterance_ignores_isolated_peaks(monkeypatch):
+    calib = av._CALIBRATION_MS // av._FRAME_MS
+    audio, end = _listen(monkeypatch, [0.001] * calib + [0.2, 0.001, 0.001] * 30)
+    assert audio is None and end is None
+
+
+# ——————————————————————————————
+# Mesures de latence & historique
+# ——————————————————————————————
+def test_summarize_percentiles():
+    samples = [{"first_audio_ms": v, "stt_ms": 10} for v in range(1, 101)]
+    report = av._summarize(samples)
+    assert report["count"] == 100
+    assert report["first_audio_ms"] == {"p50": 50, "p95": 95, "max": 100}
+    assert report["stt_ms"]["p95"] == 10
+    assert "first_sentence_ms" not in report
+    assert av._summarize([]) == {"count": 0}
+
+def test_failed_turn_leaves_history_untouched(monkeypatch):
+    session = av.VoiceSession(latency_log=None)
+    before = list(session.messages)
+    monkeypatch.setattr(av, "openai", _fake_openai(error=RuntimeError("réseau")))
+    with pytest.raises(RuntimeError):
+        session.respond(np.zeros(1600, dtype=np.float32), 0.0)
+    assert session.messages == before
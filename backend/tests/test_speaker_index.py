@@ -0,0 +1,94 @@
+import numpy as np
+
+import speaker_index as si
+
+
+def _voices(n, dim=192, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+def _noisy(vectors, scale=0.1, seed=1):
+    rng = np.random.default_rng(seed)
+    return vectors + rng.normal(scale=scale, size=vectors.shape).astype(np.float32)
+
+
+def test_match_above_threshold(tmp_path):
+    index = si.SpeakerIndex(str(tmp_path / "index.npz"))
+    voices = _voices(2)
+    first = index.identify(["SPEAKER_00", "SPEAKER_01"], voices)
+    index.rename(first["SPEAKER_00"], "Paul")
+
+    again = index.identify(["SPEAKER_00"], _noisy(voices[:1]))
+    assert again["SPEAKER_00"] == first["SPEAKER_00"]
+    assert index.display_names(again) == {"SPEAKER_00": "Paul"}
+    assert len(index.ids) == 2
+
+    stranger = index.identify(["SPEAKER_00"], _voices(1, seed=42))
+    assert stranger["SPEAKER_00"] not in first.values()
+
+def test_one_profile_per_label(tmp_path):
+    index = si.SpeakerIndex(str(tmp_path / "index.npz"))
+    voice = _voices(1)
+    index.identify(["SPEAKER_00"], voice)
+
+    # deux labels proches du même profil : un seul peut le prendre
+    mapping = index.identify(["SPEAKER_00", "SPEAKER_01"],
+                             np.vstack([_noisy(voice, seed=2), _noisy(voice, seed=3)]))
+    assert mapping["SPEAKER_00"] != mapping["SPEAKER_01"]
+    assert len(index.ids) == 2
+
+def test_cached_mapping_keeps_counts(tmp_path):
+    index = si.SpeakerIndex(str(tmp_path / "index.npz"))
+    voices = _voices(2)
+    mapping = index.identify(["SPEAKER_00", "SPEAKER_01"], voices)
+
+    audio = tmp_path / "meeting.wav"
+    audio.write_bytes(b"RIFF")
+    turns = [(0, 1000, "SPEAKER_00"), (1000, 2500, "SPEAKER_01")]
+    si.save_diarization(str(audio), turns, ["SPEAKER_00", "SPEAKER_01"], voices, mapping)
+
+    cached_turns, labels, embeddings, assigned = si.load_diarization(str(audio))
+    assert cached_turns == turns
+    assert assigned == mapping
+    assert embeddings.shape == voices.shape
+
+    counts = index.counts.copy()
+    reloaded = si.SpeakerIndex(str(tmp_path / "index.npz"))
+    assert reloaded.identify(labels, embeddings, assigned) == mapping
+    assert np.array_equal(reloaded.counts, counts)
+
+def test_ivf_past_threshold(tmp_path):
+    index = si.SpeakerIndex(str(tmp_path / "index.npz"))
+    voices = _voices(si._IVF_MIN + 44)
+    for i, voice in enumerate(voices):
+        index.identify([f"SPEAKER_{i}"], voice[None, :])
+    assert index._centroids is not None
+    assert sorted(i for lst in index._lists for i in lst) == list(range(len(voices)))
+
+    queries = _noisy(voices[:50], scale=0.3)
+    hits = 0
+    for i, query in enumerate(queries):
+        idx, sim = index.search(query)
+        hits += idx is not None and np.allclose(
+            index.vectors[idx].astype(np.float32), si._normalize(voices[i]), atol=1e-2)
+    assert hits >= 45
+
+    # un profil mis à jour reste rangé dans la liste de son centroïde le plus proche
+    for i in range(20):
+        index.identify([f"SPEAKER_{i}"], _noisy(voices[i:i + 1], scale=0.8, seed=i))
+    for idx in range(len(index.ids)):
+        assert idx in index._lists[index._bucket[idx]]
+    assert sorted(i for lst in index._lists for i in lst) == list(range(len(index.ids)))
+
+    # mauvaise dimension : ignorée, sans faire échouer le rapport
+    assert index.identify(["SPEAKER_X"], _voices(1, dim=64)) == {}
+
+    # lignes nulles de remplissage : aucun profil créé
+    n = len(index.ids)
+    assert index.identify(["SPEAKER_Y", "SPEAKER_Z"], np.zeros((2, voices.shape[1]))) == {}
+    assert len(index.ids) == n
+
+def test_cache_write_failure_is_not_fatal(tmp_path, capsys):
+    missing = tmp_path / "absent" / "meeting.wav"
+    si.save_diarization(str(missing), [(0, 1000, "SPEAKER_00")], ["SPEAKER_00"],
+                        _voices(1), {})
+    assert "Cache diarization non écrit" in capsys.readouterr().err
@@ -1,37 +1,422 @@
 import os
+import sys
+import json
+import time
+import uuid
+import wave
+import queue
+import socket
+import tempfile
 import threading
+import subprocess
+import http.client
+import urllib.parse
 import tkinter as tk
-from tkinter import scrolledtext, filedialog, messagebox
+from tkinter import ttk, scrolledtext, filedialog, messagebox
 
-from backend.meeting_transcription import (
-    start_recording,
-    stop_recording,
-    transcribe_audio,
-    summarize_text,
-    generate_word,
-)
+# ——————————————————————————————
+# Configuration générale
+# ——————————————————————————————
+BACKEND_URL  = os.getenv("MEETING_BACKEND_URL", "http://127.0.0.1:8000")
+ACCESS_CODE  = os.getenv("MEETING_ACCESS_CODE", "")
+BACKEND_DIR  = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+_CHUNK       = 256 * 1024        # taille des blocs envoyés à l’upload
+_POLL_MS     = 50                # fréquence de vidage de la file d’événements Tk
 
+
+# ——————————————————————————————
+# Client HTTP du backend (stdlib uniquement)
+# ——————————————————————————————
+class BackendError(Exception):
+    pass
+
+class BackendClient:
+    """
+    Accès aux routes du backend FastAPI : code d’accès, upload par blocs,
+    flux SSE de génération et téléchargement du rapport.
+    """
+
+    def __init__(self, base_url: str = BACKEND_URL):
+        self.token = None
+        self.set_base_url(base_url)
+
+    def set_base_url(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip("/")
+        url = urllib.parse.urlsplit(self.base_url)
+        self._scheme = url.scheme
+        self._host   = url.hostname
+        self._port   = url.port
+        self._prefix = url.path
+
+    def _conn(self, timeout=30):
+        cls = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=timeout)
+
+    def _headers(self, extra: dict = None) -> dict:
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        headers.update(extra or {})
+        return headers
+
+    @staticmethod
+    def _check(resp):
+        if resp.status >= 400:
+            body = resp.read().decode("utf-8", "replace")
+            try:
+                body = json.loads(body).get("detail", body)
+            except (ValueError, AttributeError):
+                pass
+            raise BackendError(f"{resp.status} : {body}")
+
+    def _json(self, method: str, path: str, payload=None):
+        conn = self._conn()
+        try:
+            body = json.dumps(payload) if payload is not None else None
+            conn.request(method, self._prefix + path, body=body,
+                         headers=self._headers({"Content-Type": "application/json"}))
+            resp = conn.getresponse()
+            self._check(resp)
+            return json.loads(resp.read() or b"null")
+        finally:
+            conn.close()
+
+    def validate_code(self, code: str) -> None:
+        self.token = self._json("POST", "/validate-code", {"code": code})["token"]
+
+    def upload(self, path: str, on_progress=None) -> str:
+        """
+        Envoie le fichier en multipart par blocs de `_CHUNK` octets.
+        Retourne l’id de l’enregistrement créé côté backend.
+        """
+        boundary = uuid.uuid4().hex
+        filename = os.path.basename(path).replace('"', "")
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        size = os.path.getsize(path)
+
+        conn = self._conn(timeout=300)
+        try:
+            conn.putrequest("POST", self._prefix + "/api/upload")
+            headers = self._headers({
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+                "Content-Length": str(len(head) + size + len(tail)),
+            })
+            for key, value in headers.items():
+                conn.putheader(key, value)
+            conn.endheaders()
+            conn.send(head)
+            sent = 0
+            with open(path, "rb") as f:
+                while chunk := f.read(_CHUNK):
+                    conn.send(chunk)
+                    sent += len(chunk)
+                    if on_progress:
+                        on_progress(sent, size)
+            conn.send(tail)
+            resp = conn.getresponse()
+            self._check(resp)
+            return json.loads(resp.read())["id"]
+        finally:
+            conn.close()
+
+    def report_events(self, rec_id: str):
+        """
+        Itère sur les événements SSE de /api/generate-report-stream/{id}.
+        """
+        conn = self._conn(timeout=None)
+        try:
+            conn.request("GET", f"{self._prefix}/api/generate-report-stream/{rec_id}",
+                         headers=self._headers({"Accept": "text/event-stream"}))
+            resp = conn.getresponse()
+            self._check(resp)
+            while True:
+                line = resp.readline()
+                if not line:
+                    break
+                line = line.decode("utf-8").rstrip("\r\n")
+                if line.startswith("data:"):
+                    event = json.loads(line[5:].strip())
+                    yield event
+                    if event.get("phase") in ("done", "error"):
+                        break
+        finally:
+            conn.close()
+
+    def download_report(self, rec_id: str, dest: str) -> str:
+        conn = self._conn(timeout=120)
+        try:
+            conn.request("GET", f"{self._prefix}/api/download-report/{rec_id}",
+                         headers=self._headers())
+            resp = conn.getresponse()
+            self._check(resp)
+            with open(dest, "wb") as f:
+                while chunk := resp.read(_CHUNK):
+                    f.write(chunk)
+            return dest
+        finally:
+            conn.close()
+
+
+# ——————————————————————————————
+# Serveur local (optionnel) : uvicorn lancé dans un sous-processus
+# ——————————————————————————————
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def launch_local_server():
+    """
+    Lance le backend sur un port libre, sans attendre qu’il soit prêt.
+    Le chargement du pipeline ML se fait dans ce processus, pas dans l’interface.
+    Retourne (process, port).
+    """
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app",
+         "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+    )
+    return proc, port
+
+def wait_for_server(proc, port: int, timeout: float = 120.0) -> str:
+    """
+    Attend que le serveur local accepte les connexions ; retourne son URL.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise BackendError(f"Le serveur local s’est arrêté (code {proc.returncode})")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.5)
+    stop_local_server(proc)
+    raise BackendError("Le serveur local n’a pas démarré à temps")
+
+def stop_local_server(proc, timeout: float = 10.0) -> None:
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+# ——————————————————————————————
+# Enregistrement micro local → WAV temporaire
+# ——————————————————————————————
+class Recorder:
+    """
+    Capture le micro dans un WAV PCM 16 bits, écrit au fil de l’eau.
+    Le callback audio ne fait que mettre les blocs en file ; l’écriture disque
+    se fait dans un thread dédié.
+    sounddevice n’est importé qu’au premier enregistrement.
+    """
+
+    def __init__(self, fs: int = 44100, channels: int = 1):
+        self.fs       = fs
+        self.channels = channels
+        self.path     = None
+        self._wav     = None
+        self._stream  = None
+        self._queue   = None
+        self._writer  = None
+
+    def _write(self) -> None:
+        while (block := self._queue.get()) is not None:
+            self._wav.writeframes(block)
+        self._wav.close()
+
+    def start(self) -> None:
+        import sounddevice as sd
+
+        self._queue = queue.Queue()
+
+        def callback(indata, frames, _, status):
+            if status:
+                print(f"[recording] {status}", file=sys.stderr)
+            self._queue.put(bytes(indata))
+
+        # le flux est ouvert d’abord : sans micro, rien d’autre n’est créé
+        stream = sd.RawInputStream(samplerate=self.fs, channels=self.channels,
+                                   dtype="int16", callback=callback)
+
+        self.path = os.path.join(tempfile.gettempdir(), f"meeting-{uuid.uuid4().hex[:8]}.wav")
+        self._wav = wave.open(self.path, "wb")
+        self._wav.setnchannels(self.channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(self.fs)
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+        try:
+            stream.start()
+        except Exception:
+            stream.close()
+            self._queue.put(None)
+            self._writer.join()
+            os.remove(self.path)
+            self.path = None
+            raise
+        self._stream = stream
+
+    def stop(self) -> str:
+        if self._stream is None:
+            raise RuntimeError("Aucun enregistrement en cours.")
+        self._stream.stop()
+        self._stream.close()
+        self._stream = None
+        self._queue.put(None)
+        self._writer.join()
+        return self.path
+
+
+# ——————————————————————————————
+# Interface Tk
+# ——————————————————————————————
 class App(tk.Tk):
-    def __init__(self):
+    def __init__(self, client: BackendClient, local: bool = False):
         super().__init__()
         self.title("Enregistrement de Réunion")
-        self.geometry("600x500")
-        self.resizable(False, False)
+        self.geometry("700x600")
+        self.client  = client
+        self.server  = None
+        self._events = queue.Queue()
+
         container = tk.Frame(self)
         container.pack(fill="both", expand=True)
+        container.rowconfigure(0, weight=1)
+        container.columnconfigure(0, weight=1)
         self.frames = {}
-        for Page in (HomePage, RecordPage, ReportPage):
+        for Page in (LoginPage, HomePage, RecordPage, ReportPage):
             frame = Page(container, self)
             self.frames[Page.__name__] = frame
             frame.grid(row=0, column=0, sticky="nsew")
         self.current_file = None
-        self.transcription = None
-        self.summary = None
-        self.show_frame("HomePage")
+        self.rec_id       = None
+
+        self.protocol("WM_DELETE_WINDOW", self._close)
+        self.after(_POLL_MS, self._drain)
+        self.show_frame("LoginPage")
+        if local:
+            self._start_server()
+        elif ACCESS_CODE:
+            self.frames["LoginPage"].login(ACCESS_CODE)
+
+    def _start_server(self) -> None:
+        """
+        Mode serveur local : le backend (et son pipeline ML) démarre dans un
+        sous-processus pendant que la fenêtre reste utilisable.
+        """
+        login = self.frames["LoginPage"]
+        login.set_busy("Démarrage du serveur local…")
+
+        # le processus est connu tout de suite : fermer la fenêtre pendant
+        # le chargement du modèle l’arrête aussi
+        self.server, port = launch_local_server()
+
+        def ready(base_url):
+            self.client.set_base_url(base_url)
+            login.set_ready(base_url)
+            if ACCESS_CODE:
+                login.login(ACCESS_CODE)
+
+        def failed(err):
+            login.set_ready(str(err), fg="red")
+
+        self.run_async(lambda: wait_for_server(self.server, port), ready, failed)
 
     def show_frame(self, name: str):
         self.frames[name].tkraise()
 
+    # —— passage des résultats des threads vers le thread Tk ——
+    def post(self, fn, *args) -> None:
+        """
+        Appelable depuis n’importe quel thread : `fn(*args)` sera exécuté
+        sur le thread Tk au prochain passage de `_drain`.
+        """
+        self._events.put((fn, args))
+
+    def _drain(self) -> None:
+        try:
+            while True:
+                try:
+                    fn, args = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    fn(*args)
+                except Exception:
+                    # un callback en échec ne doit pas couper les suivants
+                    self.report_callback_exception(*sys.exc_info())
+        finally:
+            self.after(_POLL_MS, self._drain)
+
+    def run_async(self, task, on_done=None, on_error=None) -> None:
+        """
+        Exécute `task()` dans un thread ; le résultat (ou l’erreur) revient
+        sur le thread Tk via `on_done` / `on_error`.
+        """
+        def runner():
+            try:
+                result = task()
+            except Exception as e:
+                self.post(on_error or self._show_error, e)
+            else:
+                if on_done:
+                    self.post(on_done, result)
+        threading.Thread(target=runner, daemon=True).start()
+
+    def _show_error(self, err: Exception) -> None:
+        messagebox.showerror("Erreur", str(err))
+
+    def _close(self) -> None:
+        stop_local_server(self.server)
+        self.destroy()
+
+class LoginPage(tk.Frame):
+    def __init__(self, parent, ctrl):
+        super().__init__(parent)
+        self.ctrl = ctrl
+        tk.Label(self, text="Code d’accès", font=("Helvetica", 20)).pack(pady=20)
+        self.entry = tk.Entry(self, width=20, justify="center")
+        self.entry.pack(pady=5)
+        self.entry.bind("<Return>", lambda _: self.login(self.entry.get()))
+        self.btn = tk.Button(self, text="Valider", width=20,
+                             command=lambda: self.login(self.entry.get()))
+        self.btn.pack(pady=5)
+        self.status = tk.Label(self, text=ctrl.client.base_url, fg="grey")
+        self.status.pack(pady=5)
+
+    def set_busy(self, text: str):
+        self.btn.config(state="disabled")
+        self.status.config(text=text, fg="grey")
+
+    def set_ready(self, text: str, fg: str = "grey"):
+        self.btn.config(state="normal")
+        self.status.config(text=text, fg=fg)
+
+    def login(self, code: str):
+        code = code.strip()
+        if not code or self.btn["state"] == "disabled":
+            return
+        self.set_busy("Connexion…")
+
+        def done(_):
+            self.btn.config(state="normal")
+            self.ctrl.show_frame("HomePage")
+
+        def failed(err):
+            self.set_ready(str(err), fg="red")
+
+        self.ctrl.run_async(lambda: self.ctrl.client.validate_code(code), done, failed)
+
 class HomePage(tk.Frame):
     def __init__(self, parent, ctrl):
         super().__init__(parent)
@@ -45,6 +430,7 @@ class RecordPage(tk.Frame):
     def __init__(self, parent, ctrl):
         super().__init__(parent)
         self.ctrl = ctrl
+        self.recorder = Recorder()
         self.is_recording = False
 
         tk.Label(self, text="Enregistrement / Upload", font=("Helvetica", 18)).pack(pady=10)
@@ -52,46 +438,110 @@ class RecordPage(tk.Frame):
         self.btn_record = tk.Button(self, text="▶️ Démarrer", width=20, command=self.toggle_record)
         self.btn_record.pack(pady=5)
 
-        tk.Button(self, text="📂 Choisir fichier", width=20, command=self._upload).pack(pady=5)
+        self.btn_file = tk.Button(self, text="📂 Choisir fichier", width=20, command=self._choose)
+        self.btn_file.pack(pady=5)
 
         self.status = tk.Label(self, text="", fg="green"); self.status.pack(pady=5)
+        self.progress = ttk.Progressbar(self, length=300, maximum=100)
+        self.progress.pack(pady=5)
         self.next_btn = tk.Button(self, text="Générer rapport", width=20, state="disabled",
-                                  command=lambda: ctrl.show_frame("ReportPage"))
+                                  command=self._next)
         self.next_btn.pack(pady=20)
+        self.retry_btn = tk.Button(self, text="🔁 Réessayer l’envoi", width=20,
+                                   command=self._retry)
+        self._retry_args = None
 
     def toggle_record(self):
         if not self.is_recording:
-            # démarrage
+            try:
+                self.recorder.start()
+            except Exception as e:
+                messagebox.showerror("Erreur", f"Micro indisponible : {e}")
+                return
             self.is_recording = True
             self.btn_record.config(text="⏹️ Stop", fg="red")
-            self.status.config(text="Enregistrement en cours…")
-            threading.Thread(target=lambda: start_recording("meeting.wav"), daemon=True).start()
+            self.btn_file.config(state="disabled")
+            self.next_btn.config(state="disabled")
+            self.status.config(text="Enregistrement en cours…", fg="green")
         else:
-            # arrêt
             self.is_recording = False
             self.btn_record.config(text="▶️ Démarrer", fg="black")
-            def _stop_and_ready():
-                wav = stop_recording()
-                self.ctrl.current_file = wav
-                self.next_btn.config(state="normal")
-                self.status.config(text=f"Fichier prêt : {wav}")
-            threading.Thread(target=_stop_and_ready, daemon=True).start()
-
-    def _upload(self):
-        path = filedialog.askopenfilename(filetypes=[("Audio","*.wav *.mp3")])
+            self.btn_file.config(state="normal")
+            self._upload(self.recorder.stop(), temporary=True)
+
+    def _choose(self):
+        path = filedialog.askopenfilename(filetypes=[("Audio","*.wav *.mp3 *.m4a")])
         if path:
-            self.ctrl.current_file = path
+            self._upload(path)
+
+    def _retry(self):
+        if self._retry_args:
+            self._upload(*self._retry_args)
+
+    def _upload(self, path: str, temporary: bool = False):
+        """
+        Envoie `path` au backend ; un enregistrement micro (`temporary`)
+        est supprimé une fois l’envoi réussi, et conservé sinon pour pouvoir
+        réessayer.
+        """
+        self.retry_btn.pack_forget()
+        self._retry_args = None
+        self.ctrl.current_file = path
+        self.ctrl.rec_id = None
+        self.next_btn.config(state="disabled")
+        self.btn_record.config(state="disabled")
+        self.btn_file.config(state="disabled")
+        self.progress["value"] = 0
+        self.status.config(text=f"Envoi : {os.path.basename(path)}", fg="green")
+
+        def on_progress(sent, total):
+            self.ctrl.post(self.progress.config, {"value": sent * 100 / max(total, 1)})
+
+        def done(rec_id):
+            self.ctrl.rec_id = rec_id
+            if temporary:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                self.ctrl.current_file = None
+            self.btn_record.config(state="normal")
+            self.btn_file.config(state="normal")
             self.next_btn.config(state="normal")
-            self.status.config(text=f"Fichier sélectionné : {os.path.basename(path)}")
+            self.status.config(text=f"Fichier prêt : {os.path.basename(path)}", fg="green")
+
+        def failed(err):
+            self.btn_record.config(state="normal")
+            self.btn_file.config(state="normal")
+            text = f"Échec de l’envoi : {err}"
+            if temporary:
+                text += f"\nEnregistrement conservé : {path}"
+            self.status.config(text=text, fg="red")
+            self._retry_args = (path, temporary)
+            self.retry_btn.pack(pady=5)
+
+        self.ctrl.run_async(lambda: self.ctrl.client.upload(path, on_progress), done, failed)
+
+    def _next(self):
+        self.ctrl.frames["ReportPage"].reset()
+        self.ctrl.show_frame("ReportPage")
 
 class ReportPage(tk.Frame):
+    _STEPS = {"diarization": "Diarization", "transcription": "Transcription",
+              "summary": "Résumé", "docx": "Génération du rapport"}
+
     def __init__(self, parent, ctrl):
         super().__init__(parent)
         self.ctrl = ctrl
+        self.running = False
+        self._total = 1
 
         tk.Label(self, text="Rapport de réunion", font=("Helvetica", 18)).pack(pady=10)
+        self.step = tk.Label(self, text="", fg="grey"); self.step.pack()
+        self.progress = ttk.Progressbar(self, length=300, maximum=100)
+        self.progress.pack(pady=5)
         self.txt_trans = scrolledtext.ScrolledText(self, height=10); self.txt_trans.pack(fill="both", expand=True, padx=10, pady=5)
-        self.txt_sum   = scrolledtext.ScrolledText(self, height=5);  self.txt_sum.pack(fill="both", expand=True, padx=10, pady=5)
+        self.txt_sum   = scrolledtext.ScrolledText(self, height=8);  self.txt_sum.pack(fill="both", expand=True, padx=10, pady=5)
 
         btn_frame = tk.Frame(self); btn_frame.pack(fill="x", pady=10)
         self.btn_gen = tk.Button(btn_frame, text="Lancer génération", width=20, command=self._generate)
@@ -100,31 +550,95 @@ class ReportPage(tk.Frame):
         self.btn_exp = tk.Button(btn_frame, text="Exporter Word", width=20, state="disabled", command=self._export)
         self.btn_exp.pack(side="right", padx=5)
 
+    def reset(self):
+        if self.running:
+            return
+        self.step.config(text="")
+        self._total = 1
+        self.progress["value"] = 0
+        self.txt_trans.delete("1.0", tk.END)
+        self.txt_sum.delete("1.0", tk.END)
+        self.btn_gen.config(state="normal")
+        self.btn_exp.config(state="disabled")
+
     def _generate(self):
-        audio = self.ctrl.current_file
-        if not audio:
-            messagebox.showwarning("Attention", "Aucun fichier audio")
+        rec_id = self.ctrl.rec_id
+        if not rec_id:
+            messagebox.showwarning("Attention", "Aucun fichier audio envoyé")
             return
+        self.reset()
+        self.running = True
         self.btn_gen.config(state="disabled")
-        self.txt_trans.delete("1.0", tk.END); self.txt_trans.insert(tk.END, "Transcription…")
-        self.txt_sum.delete("1.0", tk.END)
 
         def task():
-            text = transcribe_audio(audio)
-            self.ctrl.transcription = text
-            self.txt_trans.delete("1.0", tk.END); self.txt_trans.insert(tk.END, text)
+            for event in self.ctrl.client.report_events(rec_id):
+                self.ctrl.post(self._on_event, event)
 
-            self.txt_sum.insert(tk.END, "Résumé…")
-            summary = summarize_text(text)
-            self.ctrl.summary = summary
-            self.txt_sum.delete("1.0", tk.END); self.txt_sum.insert(tk.END, summary)
+        def finished(_=None):
+            self.running = False
+            if self.btn_exp["state"] == "disabled":
+                self.btn_gen.config(state="normal")
 
+        def failed(err):
+            finished()
+            self.step.config(text=f"Erreur : {err}", fg="red")
+
+        self.ctrl.run_async(task, finished, failed)
+
+    def _on_event(self, event: dict):
+        phase = event.get("phase")
+        if phase in self._STEPS:
+            self.step.config(text=self._STEPS[phase], fg="grey")
+
+        if phase == "diarization" and event.get("status") in ("skipped", "end"):
+            self.progress["value"] = 0
+        elif phase == "transcription":
+            if event.get("total"):
+                self._total = event["total"]
+            elif "transcript" in event:
+                # version finale, dans l’ordre chronologique
+                self.txt_trans.delete("1.0", tk.END)
+                self.txt_trans.insert(tk.END, event["transcript"])
+            elif "text" in event:
+                self.progress["value"] = event["done"] * 100 / max(self._total, 1)
+                label = f"[{event['speaker']}] " if event.get("speaker") else ""
+                self.txt_trans.insert(tk.END, f"{label}{event['text']}\n")
+                self.txt_trans.see(tk.END)
+        elif phase == "summary":
+            if event.get("status") == "start":
+                self.progress["value"] = 0
+            elif "delta" in event:
+                self.txt_sum.insert(tk.END, event["delta"])
+                self.txt_sum.see(tk.END)
+        elif phase == "done":
+            self.progress["value"] = 100
+            self.step.config(text="Rapport prêt", fg="green")
             self.btn_exp.config(state="normal")
-        threading.Thread(target=task, daemon=True).start()
+        elif phase == "error":
+            self.step.config(text=f"Erreur : {event.get('message')}", fg="red")
 
     def _export(self):
-        doc = generate_word(self.ctrl.transcription, self.ctrl.summary)
-        messagebox.showinfo("Succès", f"Document créé : {doc}")
+        dest = filedialog.asksaveasfilename(defaultextension=".docx",
+                                            initialfile=f"report-{self.ctrl.rec_id[:8]}.docx",
+                                            filetypes=[("Word", "*.docx")])
+        if not dest:
+            return
+        self.btn_exp.config(state="disabled")
+
+        def done(path):
+            self.btn_exp.config(state="normal")
+            messagebox.showinfo("Succès", f"Document créé : {path}")
+
+        def failed(err):
+            self.btn_exp.config(state="normal")
+            messagebox.showerror("Erreur", str(err))
+
+        self.ctrl.run_async(lambda: self.ctrl.client.download_report(self.ctrl.rec_id, dest),
+                            done, failed)
 
 if __name__ == "__main__":
-    App().mainloop()
+    app = App(BackendClient(), local="--local" in sys.argv)
+    try:
+        app.mainloop()
+    finally:
+        stop_local_server(app.server)